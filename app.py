@@ -5,9 +5,10 @@ import pandas as pd
 from base_solution import patient_data
 from base_solution import solution as base_s
 from optimized_solution import solution as opt_s
+from memory_profiling import profile_memory
 # from async_solution import solution as async_s
 
-from shiny import App, reactive, render, ui
+from shiny import App, reactive, render, req, ui
 from shiny.types import FileInfo
 import json
 import cProfile, pstats
@@ -38,6 +39,18 @@ def solution_profiler(fx, data):
     # Return the function result along with the analysis
     return df[["filename", "tottime", "cumtime"]]
 
+def memory_metrics(report):
+    # One row per stage, with the line that retained the most during it
+    data = [[stage["stage"],
+             round(stage["peak_bytes"] / 1024, 1),
+             round(stage["retained_bytes"] / 1024, 1),
+             stage["net_blocks"],
+             stage["top_lines"][0]["line"] if stage["top_lines"] else ""]
+            for stage in report["stages"]]
+    columns = ["stage", "peak_kib", "retained_kib", "net_blocks", "top_line"]
+
+    return pd.DataFrame(data, columns=columns)
+
 
 app_ui = ui.page_fluid( 
     ui.page_sidebar(
@@ -45,6 +58,7 @@ app_ui = ui.page_fluid(
         ui.input_select("model", "Select the transformation method:",
                         {"base": "Base", "opt": "Optimized"}),
         ui.input_file("data", "Choose JSON File", accept=[".json"], multiple=False),
+        ui.input_switch("memory", "Profile memory (tracemalloc)"),
         ui.input_action_button("button", "TRANSFORM"),
         title="OPTIONS",
         width = 400
@@ -64,7 +78,9 @@ app_ui = ui.page_fluid(
     ui.card(
         ui.card_header("METRICS"),
         ui.output_data_frame("metrics"),
-        height = 300,
+        ui.output_data_frame("display_memory_metrics"),
+        ui.output_ui("memory_export"),
+        height = 450,
         full_screen=True
     ),
     fillable=True,
@@ -98,9 +114,15 @@ def server(input, output, session):
     def transform():
         return selected_solution.get()(patient_data())
     
+    @reactive.calc
+    @reactive.event(input.button)
+    def memory_report():
+        if not input.memory():
+            return None
+        return profile_memory(selected_solution.get(), patient_data())
+
     @reactive.event(input.button)
     def get_metrics():
-        models = {"base": base_s, "opt": opt_s}
         return solution_profiler(selected_solution.get(), patient_data())
 
     @render.data_frame
@@ -115,5 +137,24 @@ def server(input, output, session):
     def metrics():
         return pd.DataFrame(get_metrics())
 
+    @render.data_frame
+    def display_memory_metrics():
+        # Shown alongside the CPU metrics once a memory profile has been run
+        req(input.memory(), memory_report())
+        return memory_metrics(memory_report())
+
+    @render.ui
+    def memory_export():
+        req(input.memory(), memory_report())
+        return ui.download_button("download_memory", "EXPORT MEMORY JSON")
+
+    # NOTE: Name the file after the solution in the report (e.g. base_solution_memory.json),
+    # so switching the model after a run doesn't mislabel it
+    @render.download(filename=lambda: f"{memory_report()['solution'].split('.')[0]}_memory.json")
+    def download_memory():
+        report = memory_report()
+        req(report)
+        yield json.dumps(report, indent=2)
+
 
 app = App(app_ui, server)
@@ -2,6 +2,7 @@ import requests
 import aiohttp
 import asyncio
 import ssl
+from memory_profiling import mark_stage, mark_patient
 
 # ASYNCH ("Batch" API calling) SOLUTION
 # (1) Using asyncio and aiohttp to make async API calls, lowering the wait time between responses/calls
@@ -39,6 +40,7 @@ async def solution(data):
     ssl_context.verify_mode = ssl.CERT_NONE
 
     all_codes = {code for patient in data for code in patient["diagnoses"]}
+    mark_stage("extract")
     code_descriptions, malformed_codes, priority_codes = {}, [], []
     priority_keywords = ["respiratory failure", "covid"]
 
@@ -59,6 +61,7 @@ async def solution(data):
             except (IndexError, KeyError) as e:
                 print(f"Error processing code {code}: {e}")
                 malformed_codes.append(code)
+    mark_stage("fetch")
 
     transformed_data = []
 
@@ -80,14 +83,14 @@ async def solution(data):
             "priority_diagnoses": priority_diagnoses,
             "malformed_diagnoses": malformed_diagnoses
         })
+        mark_patient(patient["patient_id"])
+    mark_stage("transform")
 
     ## CLEAN, SORT, and RETURN
     transformed_data.sort(key=lambda x: len(x["priority_diagnoses"]), reverse=True)
+    mark_stage("sort")
     return transformed_data
 
-# NOTE: Using asyncio.run() to run our async solution function
-output = asyncio.run(solution(patient_data))
-
 expected_output = [
         {'patient_id': 1,
          'diagnoses': [
@@ -132,9 +135,15 @@ expected_output = [
          'malformed_diagnoses': [1]
         }
     ]
-try:
-    assert(output == expected_output)
-except AssertionError:
-    print('error: your output does not match the expected output')
-else:
-    print('success!')
+
+# NOTE: Only check the output when run directly, so importing the solution
+# (the dashboard, memory_profiling) doesn't make a full run of API calls
+if __name__ == "__main__":
+    # NOTE: Using asyncio.run() to run our async solution function
+    output = asyncio.run(solution(patient_data))
+    try:
+        assert(output == expected_output)
+    except AssertionError:
+        print('error: your output does not match the expected output')
+    else:
+        print('success!')
@@ -24,6 +24,7 @@
 # API docs: https://clinicaltables.nlm.nih.gov/apidoc/icd10cm/v3/doc.html
 
 import requests
+from memory_profiling import mark_stage, mark_patient
 
 base_url = ("https://clinicaltables.nlm.nih.gov/api/icd10cm/v3/search"
             "?sf={search_fields}&terms={search_term}&maxList={max_list}")
@@ -48,6 +49,7 @@ def solution(data):
     ## EXTRACT all of the codes from our data ##
     # For each patients in data, get each code in "diagnoses" indx
     all_codes = {code for patient in data for code in patient["diagnoses"]}
+    mark_stage("extract")
 
     ## INSTANTIATE lists ##
     # Lets make caches of all the descriptions, and malformed/priority codes we find 
@@ -97,6 +99,7 @@ def solution(data):
         else:
             # Also add to our malformed codes
             malformed_codes.append(code)
+    mark_stage("fetch")
 
     ## UPDATE DATA with our new descriptions ##
     transformed_data = []
@@ -138,15 +141,16 @@ def solution(data):
             "priority_diagnoses": priority_diagnoses,
             "malformed_diagnoses": malformed_diagnoses
         })
+        mark_patient(id)
+    mark_stage("transform")
     
     ## RETURN our result ##
     transformed_data.sort(key=lambda x: len(x["priority_diagnoses"]), reverse=True)
+    mark_stage("sort")
 
     return transformed_data
 
 
-output = solution(patient_data)
-
 expected_output = [
         {'patient_id': 1,
          'diagnoses': [
@@ -191,9 +195,14 @@ expected_output = [
          'malformed_diagnoses': [1]
         }
     ]
-try:
-    assert(output == expected_output)
-except AssertionError:
-    print('error: your output does not match the expected output')
-else:
-    print('success!')
+
+# NOTE: Only check the output when run directly, so importing the solution
+# (the dashboard, memory_profiling) doesn't make a full run of API calls
+if __name__ == "__main__":
+    output = solution(patient_data)
+    try:
+        assert(output == expected_output)
+    except AssertionError:
+        print('error: your output does not match the expected output')
+    else:
+        print('success!')
@@ -21,3 +21,8 @@ p.strip_dirs().sort_stats("time").print_stats(10)  # Top 10 slowest functions
 p = pstats.Stats("benchmarking/async_solution.prof")
 p.strip_dirs().sort_stats("time").print_stats(10)  # Top 10 slowest functions
 
+
+# Run memory profiling (tracemalloc) for each solution and export the results as JSON
+subprocess.run(["python3.11", "-m", "memory_profiling", "base_solution", "-o", "benchmarking/base_solution_memory.json"])
+subprocess.run(["python3.11", "-m", "memory_profiling", "optimized_solution", "-o", "benchmarking/optimized_solution_memory.json"])
+subprocess.run(["python3.11", "-m", "memory_profiling", "async_solution", "-o", "benchmarking/async_solution_memory.json"])
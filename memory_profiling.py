@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import fnmatch
+import importlib
+import inspect
+import json
+import linecache
+import platform
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+
+# MEMORY PROFILING
+# (1) Using tracemalloc to take a snapshot at the end of each transform stage of a solution
+# (2) Reporting the peak and retained memory of each stage, with retained memory grouped by source line
+# (3) Tracking the memory and blocks each patient leaves behind (and peaks at) during the transform stage
+# The solutions call mark_stage() and mark_patient(), which do nothing unless a profile is running
+
+# NOTE: Traces from tracemalloc and from this file are profiling overhead, so we drop them
+snapshot_filters = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+# The profile that is currently running (None when profiling is off)
+active_profile = None
+
+
+def take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces(snapshot_filters)
+
+
+def snapshot_totals(snapshot):
+    # Number of live blocks and their total size in bytes
+    return len(snapshot.traces), sum(trace.size for trace in snapshot.traces)
+
+
+def top_lines(snapshot, previous, top):
+    # Group the memory retained since the previous snapshot by the line that allocated it
+    # NOTE: These are net figures, so anything allocated and freed in between doesn't show up
+    stats = [stat for stat in snapshot.compare_to(previous, "lineno") if stat.size_diff or stat.count_diff]
+    return [{"line": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             "size_bytes": stat.size_diff,
+             "net_blocks": stat.count_diff} for stat in stats[:top]]
+
+
+def add_source(report):
+    # NOTE: linecache allocates as it reads files, so we only look up the code once tracing has stopped
+    for stage in report["stages"]:
+        for line in stage["top_lines"]:
+            filename, _, lineno = line["line"].rpartition(":")
+            line["code"] = linecache.getline(filename, int(lineno)).strip()
+
+
+class MemoryProfile:
+
+    def __init__(self, top):
+        self.top = top
+        self.stages, self.patients = [], []
+        # Bytes and blocks the profiler itself keeps alive (records, the held snapshot), which
+        # get_traced_memory() and sys.getallocatedblocks() count but the solution never allocated
+        self.overhead, self.block_overhead = 0, 0
+
+        # NOTE: Our own readings leave a few ints alive, so measure an empty bookkeeping
+        # step once and take that cost back off every real one
+        self.reading_size, self.reading_blocks = 0, 0
+        self.reading_size, self.reading_blocks = self.kept_alive(lambda: None)
+
+        # Snapshot (and totals) at the end of the last stage
+        self.last = take_snapshot()
+        self.blocks, self.size = snapshot_totals(self.last)
+        self.start_size = self.size
+
+        self.start_memory = self.reset_peak()
+        self.run_peak = self.start_memory
+
+    def traced_memory(self):
+        # tracemalloc's (current, peak) without the profiler's own overhead
+        current, peak = tracemalloc.get_traced_memory()
+        return current - self.overhead, peak - self.overhead
+
+    def allocated_blocks(self):
+        # The interpreter's live blocks without the profiler's own
+        # NOTE: This only counts small-object (pymalloc) blocks, so buffers over 512 bytes are left out
+        return sys.getallocatedblocks() - self.block_overhead
+
+    def kept_alive(self, bookkeeping):
+        # Bytes and blocks that bookkeeping() leaves alive
+        start, start_blocks = tracemalloc.get_traced_memory()[0], sys.getallocatedblocks()
+        bookkeeping()
+        size, blocks = tracemalloc.get_traced_memory()[0] - start, sys.getallocatedblocks() - start_blocks
+        return size - self.reading_size, blocks - self.reading_blocks
+
+    def add_overhead(self, bookkeeping):
+        # Run bookkeeping() and count whatever it keeps alive as ours, so it doesn't
+        # pile up in the peaks and block counts of the solution
+        size, blocks = self.kept_alive(bookkeeping)
+        self.overhead += size
+        self.block_overhead += blocks
+
+    def reset_peak(self):
+        # NOTE: Taking a snapshot allocates memory of its own, so we reset the peak after
+        # each one and keep track of the highest value we saw before it
+        tracemalloc.reset_peak()
+        self.baseline = self.peak = self.patient_memory = self.traced_memory()[0]
+        self.patient_blocks = self.allocated_blocks()
+        return self.baseline
+
+    def mark_stage(self, name):
+        self.peak = max(self.peak, self.traced_memory()[1])
+        self.run_peak = max(self.run_peak, self.peak)
+
+        # The new snapshot replaces the old one, so the difference (and the stage record) is ours
+        self.add_overhead(lambda: self.record_stage(name))
+        self.reset_peak()
+
+    def record_stage(self, name):
+        snapshot = take_snapshot()
+        blocks, size = snapshot_totals(snapshot)
+        self.stages.append({
+            "stage": name,
+            "peak_bytes": self.peak - self.baseline,
+            "retained_bytes": size - self.size,
+            "net_blocks": blocks - self.blocks,
+            "top_lines": top_lines(snapshot, self.last, self.top)
+        })
+        self.last, self.blocks, self.size = snapshot, blocks, size
+
+    def mark_patient(self, patient_id):
+        # NOTE: Snapshots cost O(live heap), so patients only use the running counters
+        current, peak = self.traced_memory()
+        blocks = self.allocated_blocks()
+        self.peak = max(self.peak, peak)
+
+        # The record stays alive for the rest of the run, so it counts as ours
+        self.add_overhead(lambda: self.patients.append({
+            "patient_id": patient_id,
+            "peak_bytes": peak - self.patient_memory,
+            "retained_bytes": current - self.patient_memory,
+            "net_blocks": blocks - self.patient_blocks
+        }))
+
+        tracemalloc.reset_peak()
+        self.patient_memory, self.patient_blocks = current, blocks
+
+    def report(self):
+        self.run_peak = max(self.run_peak, self.peak, self.traced_memory()[1])
+        _, size = snapshot_totals(take_snapshot())
+        return {
+            "peak_bytes": self.run_peak - self.start_memory,
+            "retained_bytes": size - self.start_size,
+            "stages": self.stages,
+            "patients": self.patients
+        }
+
+
+def mark_stage(name):
+    # Called by the solutions at the END of each stage (extract, fetch, transform, sort)
+    if active_profile is not None:
+        active_profile.mark_stage(name)
+
+
+def mark_patient(patient_id):
+    # Called by the solutions once each patient's entry has been built
+    if active_profile is not None:
+        active_profile.mark_patient(patient_id)
+
+
+def profile_memory(fx, data, top=10):
+    global active_profile
+
+    # Start tracemalloc ourselves unless it is already running (e.g. PYTHONTRACEMALLOC=1)
+    started = not tracemalloc.is_tracing()
+    if started:
+        # NOTE: Compile the filter patterns first so fnmatch doesn't show up in the stages
+        for snapshot_filter in snapshot_filters:
+            fnmatch.fnmatch("", snapshot_filter.filename_pattern)
+        tracemalloc.start()
+
+    active_profile = MemoryProfile(top)
+    try:
+        result = fx(data)
+        # NOTE: The async solution returns a coroutine, so run it to completion here
+        if inspect.iscoroutine(result):
+            asyncio.run(result)
+        report = active_profile.report()
+    finally:
+        active_profile = None
+        if started:
+            tracemalloc.stop()
+    add_source(report)
+
+    # Tag the report so runs can be compared over time
+    return {
+        "solution": f"{fx.__module__}.{fx.__name__}",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "patient_count": len(data),
+        **report
+    }
+
+
+def save_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def print_report(report, top=5):
+    print(f"{report['solution']} ({report['timestamp']})")
+    print(f"    peak {report['peak_bytes'] / 1024:.1f} KiB, "
+          f"retained {report['retained_bytes'] / 1024:.1f} KiB\n")
+
+    for stage in report["stages"]:
+        print(f"  {stage['stage']}: peak {stage['peak_bytes'] / 1024:.1f} KiB, "
+              f"retained {stage['retained_bytes'] / 1024:.1f} KiB, "
+              f"{stage['net_blocks']} net blocks")
+        for line in stage["top_lines"][:top]:
+            print(f"    {line['size_bytes']:>10} B {line['net_blocks']:>6}  {line['line']}")
+
+    # NOTE: Only print the patients with the highest peaks, the full list is in the JSON export
+    patients = sorted(report["patients"], key=lambda patient: patient["peak_bytes"], reverse=True)
+    print(f"\n  top {min(top, len(patients))} of {len(patients)} patients by peak")
+    print("  patient_id  peak (B)  retained (B)  net blocks")
+    for patient in patients[:top]:
+        print(f"  {patient['patient_id']!s:>10}  {patient['peak_bytes']:>8}  {patient['retained_bytes']:>12}"
+              f"  {patient['net_blocks']:>10}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the memory use of a solution with tracemalloc")
+    parser.add_argument("solution", help="solution module to profile, e.g. base_solution")
+    parser.add_argument("-o", "--output", help="path to export the JSON report to")
+    parser.add_argument("--top", type=int, default=10,
+                        help="number of source lines to keep per stage and patients to print")
+    args = parser.parse_args()
+
+    module = importlib.import_module(args.solution)
+    report = profile_memory(module.solution, module.patient_data, args.top)
+
+    if args.output:
+        save_report(report, args.output)
+    print_report(report, args.top)
+
+
+if __name__ == "__main__":
+    # NOTE: The solutions import this module by name, so run through that copy
+    # instead of __main__ so that both share the same active_profile
+    import memory_profiling
+    memory_profiling.main()
@@ -1,6 +1,7 @@
 import requests
 import json
 import itertools
+from memory_profiling import mark_stage, mark_patient
 
 # OPTIMIZED SOLUTION
 # (1) Using requests.Session() to keep a consistent session and reduce slowdown from SSL/TLS handshake
@@ -32,6 +33,7 @@ def solution(data):
 
     # NOTE: Used itertools to extract codes
     all_codes = set(itertools.chain.from_iterable(patient["diagnoses"] for patient in data))
+    mark_stage("extract")
 
     code_descriptions, malformed_codes, priority_codes  = {}, [], []
     priority_keywords = ["respiratory failure", "covid"]
@@ -70,6 +72,7 @@ def solution(data):
             # NOT SUCCESSFUL (other status codes)
         else:
             malformed_codes.append(code)
+    mark_stage("fetch")
 
     ## UPDATE DATA with our new descriptions ##
 
@@ -107,17 +110,23 @@ def solution(data):
         }
 
         return transformed_data
+
+    # NOTE: Mark each patient once construct_new_entry has returned and freed its temporaries
+    def construct_and_mark(patient):
+        entry = construct_new_entry(patient)
+        mark_patient(patient["patient_id"])
+        return entry
     
     # NOTE: Use map() to construct the entry for each patient and make into a list
-    final_data = list(map(construct_new_entry, data))
+    final_data = list(map(construct_and_mark, data))
+    mark_stage("transform")
     
     ## RETURN our result ##
     final_data.sort(key=lambda x: len(x["priority_diagnoses"]), reverse=True)
+    mark_stage("sort")
 
     return final_data
 
-output = solution(patient_data)
-
 expected_output = [
         {'patient_id': 1,
          'diagnoses': [
@@ -162,9 +171,14 @@ expected_output = [
          'malformed_diagnoses': [1]
         }
     ]
-try:
-    assert(output == expected_output)
-except AssertionError:
-    print('error: your output does not match the expected output')
-else:
-    print('success!')
+
+# NOTE: Only check the output when run directly, so importing the solution
+# (the dashboard, memory_profiling) doesn't make a full run of API calls
+if __name__ == "__main__":
+    output = solution(patient_data)
+    try:
+        assert(output == expected_output)
+    except AssertionError:
+        print('error: your output does not match the expected output')
+    else:
+        print('success!')